@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import gspread
 from gspread_pandas import Spread
 from gspread.exceptions import SpreadsheetNotFound, APIError
@@ -28,6 +29,9 @@ SHEET_OPTIONS = {
     "6번 밀도": "6번 밀도"
 }
 
+# 시트에 기록되는 점수 컬럼 목록 (로더와 시각화에서 공통으로 사용)
+SCORE_COLUMNS = ['총점', '1-1 점수', '1-2 점수', '1-3 점수', '2-1 점수', '2-2 점수', '2-3 점수', '3-1 점수', '3-2 점수', '3-3 점수']
+
 st.sidebar.header("조회 정보 입력")
 selected_sheet_key = st.sidebar.selectbox(
     "분석할 성찰 일지를 선택하세요:",
@@ -38,8 +42,33 @@ sheet_name = SHEET_OPTIONS[selected_sheet_key]
 user_name = st.sidebar.text_input("이름을 입력하세요:")
 user_email = st.sidebar.text_input("이메일을 입력하세요:")
 
+# 인증된 gspread 클라이언트는 프로세스당 한 번만 생성합니다.
+# (JWT 서명 + 토큰 교환을 시트가 바뀔 때마다 반복하지 않습니다.)
+@st.cache_resource
+def get_gspread_client():
+    creds_info = st.secrets["gcp_service_account"]
+    creds_dict = {
+        "type": creds_info["type"],
+        "project_id": creds_info["project_id"],
+        "private_key_id": creds_info["private_key_id"],
+        "private_key": creds_info["private_key"],
+        "client_email": creds_info["client_email"],
+        "client_id": creds_info["client_id"],
+        "auth_uri": creds_info["auth_uri"],
+        "token_uri": creds_info["token_uri"],
+        "auth_provider_x509_cert_url": creds_info["auth_provider_x509_cert_url"],
+        "client_x509_cert_url": creds_info["client_x509_cert_url"]
+    }
+    if "universe_domain" in creds_info:
+        creds_dict["universe_domain"] = creds_info["universe_domain"]
+
+    return gspread.service_account_from_dict(creds_dict)
+
+
 # 데이터 불러오기 및 진단 기능이 강화된 함수
-@st.cache_data(ttl=600)
+# 읽기 전용 DataFrame은 전역 리소스이므로 cache_resource로 보관합니다.
+# (cache_data와 달리 조회할 때마다 직렬화/복사 비용이 들지 않습니다.)
+@st.cache_resource(ttl=600)
 def load_data_with_diagnostics(spreadsheet_name, sheet_name):
     """
     데이터 로딩을 시도하고, 실패 시 구체적인 원인과 해결책을 안내하는 함수
@@ -52,34 +81,27 @@ def load_data_with_diagnostics(spreadsheet_name, sheet_name):
             return None
 
         # 2. Google Sheets 클라이언트 인증 시도 (안정화된 최종 버전)
-        creds_info = st.secrets["gcp_service_account"]
-        creds_dict = {
-            "type": creds_info["type"],
-            "project_id": creds_info["project_id"],
-            "private_key_id": creds_info["private_key_id"],
-            "private_key": creds_info["private_key"],
-            "client_email": creds_info["client_email"],
-            "client_id": creds_info["client_id"],
-            "auth_uri": creds_info["auth_uri"],
-            "token_uri": creds_info["token_uri"],
-            "auth_provider_x509_cert_url": creds_info["auth_provider_x509_cert_url"],
-            "client_x509_cert_url": creds_info["client_x509_cert_url"]
-        }
-        if "universe_domain" in creds_info:
-            creds_dict["universe_domain"] = creds_info["universe_domain"]
-        
-        gspread_client = gspread.service_account_from_dict(creds_dict)
-
+        gspread_client = get_gspread_client()
 
         # 3. 특정 스프레드시트 및 시트 접근 시도
         spread = Spread(spreadsheet_name, sheet=sheet_name, client=gspread_client)
         df = spread.sheet_to_df(index=False)
         
-        # 데이터 타입 변환 및 정리
-        for col in df.columns:
-            if '점수' in col or '총점' in col:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        return df
+        # 데이터 타입 변환 및 정리 (이미 알고 있는 점수 컬럼만 숫자로 변환)
+        num_cols = [c for c in SCORE_COLUMNS if c in df.columns]
+        df[num_cols] = df[num_cols].apply(pd.to_numeric, errors='coerce')
+
+        # 조회용 키 컬럼을 캐시 시점에 한 번만 정규화해 둡니다.
+        # (버튼을 누를 때마다 전체 컬럼에 str.strip()을 돌리지 않습니다.)
+        df['_name_key'] = df['이름'].str.strip()
+        df['_email_key'] = df['이메일'].str.strip()
+
+        # (이름, 이메일) -> 행 번호 해시맵: 버튼 클릭 시 O(1) 조회가 가능합니다.
+        idx = {(n, e): i for i, (n, e) in enumerate(zip(df['_name_key'], df['_email_key']))}
+
+        # Box Plot용 점수 배열도 캐시 시점에 미리 결측치를 제거해 둡니다.
+        box_data = {c: df[c].dropna().to_numpy() for c in SCORE_COLUMNS if c in df.columns}
+        return df, idx, box_data
 
     # 4. 발생한 오류 종류에 따라 맞춤형 안내 메시지 표시
     except SpreadsheetNotFound:
@@ -131,44 +153,43 @@ if st.sidebar.button("📊 내 결과 분석하기"):
         st.warning("이름과 이메일을 모두 입력해주세요.")
     else:
         # 진단 기능이 포함된 함수를 호출합니다.
-        df = load_data_with_diagnostics(SPREADSHEET_NAME, sheet_name)
+        loaded = load_data_with_diagnostics(SPREADSHEET_NAME, sheet_name)
 
-        # df가 None이면 오류가 발생하여 함수가 중단된 것이므로, 아래 코드를 실행하지 않습니다.
-        if df is not None:
+        # 반환값이 None이면 오류가 발생하여 함수가 중단된 것이므로, 아래 코드를 실행하지 않습니다.
+        if loaded is not None:
+            df, idx, box_data = loaded
             if df.empty:
                 st.warning("데이터가 비어있습니다. 구글 시트에 채점 결과가 있는지 확인해주세요.")
             else:
-                user_data = df[(df['이름'].str.strip() == user_name.strip()) & (df['이메일'].str.strip() == user_email.strip())]
+                row_i = idx.get((user_name.strip(), user_email.strip()))
 
-                if user_data.empty:
+                if row_i is None:
                     st.error("일치하는 정보가 없습니다. 이름과 이메일, 그리고 선택한 성찰 일지가 맞는지 다시 확인해주세요.")
                 else:
                     # --- (기존의 시각화 및 표 생성 코드는 여기부터 동일합니다) ---
-                    user_series = user_data.iloc[0]
+                    user_series = df.iloc[row_i]
                     st.success(f"### {user_name}님의 [{selected_sheet_key}] 분석 결과입니다.")
                     st.markdown("---")
 
                     st.subheader("📈 전체 집단과 나의 위치 비교")
                     st.info("Box Plot은 전체 응답자의 점수 분포를 보여줍니다. 상자 안의 선은 중앙값이며, 붉은 별⭐은 나의 점수 위치를 나타냅니다.")
 
-                    score_columns = ['총점', '1-1 점수', '1-2 점수', '1-3 점수', '2-1 점수', '2-2 점수', '2-3 점수', '3-1 점수', '3-2 점수', '3-3 점수']
-                    cols = st.columns(len(score_columns))
-
-                    for i, col_name in enumerate(score_columns):
-                        with cols[i]:
-                            fig = go.Figure()
-                            fig.add_trace(go.Box(y=df[col_name].dropna(), name='전체 분포', marker_color='#1f77b4'))
-                            fig.add_trace(go.Scatter(y=[user_series[col_name]], mode='markers', name='나의 점수', marker=dict(color='red', size=12, symbol='star')))
-                            fig.update_layout(title=dict(text=f'<b>{col_name}</b>', x=0.5), showlegend=False, yaxis_title="점수", margin=dict(l=10, r=10, t=40, b=10), height=350)
-                            st.plotly_chart(fig, use_container_width=True)
+                    # 그래프 10개를 따로 그리지 않고 서브플롯 하나로 묶어 한 번에 전송합니다.
+                    fig = make_subplots(rows=1, cols=len(SCORE_COLUMNS), subplot_titles=[f'<b>{c}</b>' for c in SCORE_COLUMNS])
+                    for i, col_name in enumerate(SCORE_COLUMNS):
+                        fig.add_trace(go.Box(y=box_data[col_name], name='전체 분포', marker_color='#1f77b4'), row=1, col=i + 1)
+                        fig.add_trace(go.Scatter(y=[user_series[col_name]], mode='markers', name='나의 점수', marker=dict(color='red', size=12, symbol='star')), row=1, col=i + 1)
+                    fig.update_layout(showlegend=False, margin=dict(l=10, r=10, t=40, b=10), height=350)
+                    fig.update_yaxes(title_text="점수", row=1, col=1)
+                    st.plotly_chart(fig, use_container_width=True)
 
                     st.markdown("<br>", unsafe_allow_html=True)
                     st.subheader("📑 문항별 세부 결과")
                     st.info("각 문항별 나의 점수, 내가 작성한 답변, 그리고 AI가 제시한 채점 근거입니다.")
                     summary_data = []
                     question_indices = ['1-1', '1-2', '1-3', '2-1', '2-2', '2-3', '3-1', '3-2', '3-3']
-                    for idx in question_indices:
-                        summary_data.append({"문항": f"**{idx}**", "나의 점수": user_series[f'{idx} 점수'], "내가 작성한 답변": user_series[idx], "채점 근거": user_series[f'{idx} 근거']})
+                    for q in question_indices:
+                        summary_data.append({"문항": q, "나의 점수": user_series[f'{q} 점수'], "내가 작성한 답변": user_series[q], "채점 근거": user_series[f'{q} 근거']})
                     summary_df = pd.DataFrame(summary_data)
-                    st.markdown(summary_df.to_html(escape=False, index=False), unsafe_allow_html=True)
+                    st.dataframe(summary_df, hide_index=True, use_container_width=True)
 